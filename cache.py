@@ -0,0 +1,115 @@
+"""Persistent response cache for generated research papers.
+
+Repeated (or closely paraphrased) queries are served from a local SQLite
+database instead of re-running the web tools and the LLM call. Lookups are
+two-tier: an exact match on a hash of the normalized query+model, then an
+optional semantic match via sentence embeddings when the embedding model is
+installed.
+"""
+import hashlib
+import sqlite3
+import time
+from array import array
+from typing import Optional
+
+# Minimum cosine similarity for a semantic cache hit.
+SIMILARITY_THRESHOLD = 0.92
+
+_EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# The embedding model is optional and expensive to load, so do it lazily and
+# remember a failed import/load instead of retrying on every lookup.
+_embedder = None
+_embedder_unavailable = False
+
+
+def _get_embedder():
+    global _embedder, _embedder_unavailable
+    if _embedder is None and not _embedder_unavailable:
+        try:
+            from sentence_transformers import SentenceTransformer
+
+            _embedder = SentenceTransformer(_EMBED_MODEL_NAME)
+        except Exception:
+            _embedder_unavailable = True
+    return _embedder
+
+
+def _cosine(a: array, b: array) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = sum(x * x for x in a) ** 0.5
+    nb = sum(y * y for y in b) ** 0.5
+    if na == 0 or nb == 0:
+        return 0.0
+    return dot / (na * nb)
+
+
+class ResearchCache:
+    """Exact + semantic cache of query -> response JSON, persisted to SQLite."""
+
+    def __init__(self, path: str = "research_cache.db"):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "query_hash TEXT PRIMARY KEY, "
+            "embedding BLOB, "
+            "model TEXT, "
+            "response_json TEXT, "
+            "ts REAL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(query: str, model: str) -> str:
+        return hashlib.sha256(
+            (model + "\0" + query.strip().lower()).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def _embed(query: str) -> Optional[array]:
+        embedder = _get_embedder()
+        if embedder is None:
+            return None
+        return array("f", embedder.encode(query.strip().lower()))
+
+    def get(self, query: str, model: str) -> Optional[str]:
+        """Return the cached response JSON for this query, or None on a miss."""
+        row = self._conn.execute(
+            "SELECT response_json FROM responses WHERE query_hash = ?",
+            (self._key(query, model),),
+        ).fetchone()
+        if row:
+            return row[0]
+
+        # Semantic tier: compare against stored embeddings for the same model.
+        emb = self._embed(query)
+        if emb is None:
+            return None
+        best = None
+        best_sim = SIMILARITY_THRESHOLD
+        for blob, response_json in self._conn.execute(
+            "SELECT embedding, response_json FROM responses WHERE model = ? AND embedding IS NOT NULL",
+            (model,),
+        ):
+            stored = array("f")
+            stored.frombytes(blob)
+            sim = _cosine(emb, stored)
+            if sim > best_sim:
+                best_sim = sim
+                best = response_json
+        return best
+
+    def put(self, query: str, model: str, response_json: str) -> None:
+        """Store a response under both the exact key and its embedding."""
+        emb = self._embed(query)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (
+                self._key(query, model),
+                emb.tobytes() if emb is not None else None,
+                model,
+                response_json,
+                time.time(),
+            ),
+        )
+        self._conn.commit()
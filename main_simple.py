@@ -1,16 +1,29 @@
 from dotenv import load_dotenv
+import asyncio
+import io
 import os
 import json
+import time
+import re
 import argparse
+import string
+from datetime import datetime
 from typing import List
 
+import json5
+import orjson
+
 from google import genai
-from pydantic import BaseModel
+from google.genai import types
+from pydantic import BaseModel, ConfigDict
 
-from tools import search_tool, wiki_tool, save_tool, web_search_tool
+from cache import ResearchCache
+from tools import save_tool, web_search_async, search_async, wiki_async
 
 
 class ResearchResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     topic: str
     abstract: str
     introduction: str
@@ -24,6 +37,17 @@ class ResearchResponse(BaseModel):
     tools_used: List[str]
 
 
+# Initialize the response cache lazily when needed
+_research_cache = None
+
+
+def get_research_cache():
+    global _research_cache
+    if _research_cache is None:
+        _research_cache = ResearchCache()
+    return _research_cache
+
+
 # Initialize the Google GenAI client lazily when needed
 def get_genai_client():
     load_dotenv()  # Load environment variables only when needed
@@ -54,32 +78,180 @@ Format your response in this JSON structure exactly (keys must match):
 Please produce long, academic-quality content for each section (use the earlier conversation guidance for approximate target lengths).
 """
 
+# Passing the static system prompt as system_instruction (rather than
+# prepending it to every request body) keeps the prompt prefix byte-identical
+# across calls, which lets the API reuse its KV cache for that prefix.
+# The hard timeout (ms) stops a stalled connection from hanging the CLI.
+_GENERATION_CONFIG = types.GenerateContentConfig(
+    system_instruction=SYSTEM_PROMPT,
+    http_options=types.HttpOptions(timeout=120_000),
+)
+
+# Transient Gemini failures (5xx, dropped streams) are retried with
+# exponential backoff before giving up.
+_MAX_LLM_ATTEMPTS = 3
+
+# Per-request prompt, compiled once at module load; only the query and the
+# tools block vary per call. The system prompt itself rides along as
+# system_instruction in _GENERATION_CONFIG above.
+_PROMPT_TEMPLATE = string.Template(
+    "User query: ${query}\n\nTool outputs (JSON):\n${tools}\n\n"
+    "Using the above tool outputs where relevant, produce the full research paper as a single JSON object following the schema exactly."
+)
+
+
+def _extract_json_object(text: str) -> str:
+    """Slice out the outermost {...} object with a single linear brace-depth scan.
+
+    Tracks string/escape state so braces inside string values don't confuse
+    the depth count. Returns the text unchanged if no balanced object is found.
+    """
+    depth = 0
+    start = -1
+    in_string = False
+    escaped = False
+    for i, c in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+            continue
+        if c == '"':
+            in_string = True
+        elif c == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0 and start != -1:
+                return text[start:i + 1]
+    return text
+
+
+def _parse_json_response(text: str) -> dict:
+    """Parse possibly-messy LLM output into a dict.
+
+    Fast path is orjson on the whole text; on failure the first balanced
+    {...} object is sliced out in one pass and retried, and json5 is the
+    last resort for tolerance of trailing commas and similar slop.
+    """
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+    candidate = _extract_json_object(text)
+    try:
+        return orjson.loads(candidate)
+    except orjson.JSONDecodeError:
+        return json5.loads(candidate)
+
+
+# Combined field pattern for the last-resort extractor below, compiled once
+# at module load instead of building a fresh per-field pattern on each call.
+_FIELD_RE = re.compile(
+    r'"(topic|abstract|introduction|literature_review|methodology|'
+    r'analysis_and_findings|discussion|future_research|conclusion|'
+    r'sources|tools_used)"\s*:\s*(?:"([\s\S]*?)"\s*[,}]|\[([\s\S]*?)\])'
+)
+_LIST_ITEM_RE = re.compile(r'"([\s\S]*?)"')
+
+
+def _extract_fields(text: str) -> dict:
+    """Best-effort field extraction for output no JSON parser could recover.
+
+    A single finditer pass over the text with the precompiled combined
+    pattern, dispatching on whether the string or list capture group fired.
+    Missing fields default to empty so the result always validates.
+    """
+    parsed = {
+        "topic": "",
+        "abstract": "",
+        "introduction": "",
+        "literature_review": "",
+        "methodology": "",
+        "analysis_and_findings": "",
+        "discussion": "",
+        "future_research": "",
+        "conclusion": "",
+        "sources": [],
+        "tools_used": [],
+    }
+    for m in _FIELD_RE.finditer(text):
+        key, string_val, list_val = m.group(1, 2, 3)
+        if list_val is not None:
+            parsed[key] = [it.strip() for it in _LIST_ITEM_RE.findall(list_val)]
+        elif string_val is not None:
+            parsed[key] = string_val.strip()
+    return parsed
+
+
+def _clip(s: str, n: int = 1500) -> str:
+    """Cap a tool output at n chars (cut at a word boundary) before it is
+    embedded in the prompt, so one verbose search result can't inflate the
+    LLM input cost."""
+    if len(s) <= n:
+        return s
+    return s[:n].rsplit(" ", 1)[0] + " …[truncated]"
+
 
 def _strip_code_fences(text: str) -> str:
     t = text.strip()
-    if t.startswith("```json"):
-        t = t[len("```json"):]
-    if t.startswith("```"):
-        t = t[3:]
-    if t.endswith("```"):
-        t = t[:-3]
+    # Constant-size slice compares (a single memcmp each) decide whether any
+    # fence is present at all; the common unfenced response returns here.
+    if t[:3] != "```" and t[-3:] != "```":
+        return t
+    # removeprefix/removesuffix are no-op C calls on mismatch, avoiding the
+    # startswith-then-slice copies of a multi-KB string.
+    t = t.removeprefix("```json").removeprefix("```").removesuffix("```")
     return t.strip()
 
 
 def generate_research(query: str, model: str = "gemini-2.5-flash") -> ResearchResponse:
-    # Run tools proactively and attach outputs to the prompt
+    # Serve repeated (or paraphrased) queries from the persistent cache
+    # before paying for any network or LLM calls. Cache failures must never
+    # break generation, so any error here — including a corrupt or
+    # schema-stale stored row — falls through to regeneration, which then
+    # overwrites the bad entry.
+    cache = None
+    try:
+        cache = get_research_cache()
+        cached = cache.get(query, model)
+        if cached:
+            return ResearchResponse.model_validate(json.loads(cached))
+    except Exception:
+        pass
+
+    # Run tools proactively and attach outputs to the prompt. The three
+    # lookups are independent network calls, so fan them out concurrently
+    # and wait for the slowest one instead of paying for all three in series.
     tool_outputs = {}
     try:
-        ws = web_search_tool(query, max_results=5)
+        async def _gather():
+            return await asyncio.gather(
+                web_search_async(query, max_results=5),
+                search_async(query, results=5, sentences=3),
+                wiki_async(query, sentences=5),
+                return_exceptions=True,
+            )
+
+        ws, wp, wsum = asyncio.run(_gather())
+        if isinstance(ws, BaseException):
+            ws = f"Web search tool error: {ws}"
+        ws = _clip(ws)
         tool_outputs["web_search"] = ws
 
-        wp = search_tool(query, results=5, sentences=3)
+        if isinstance(wp, BaseException):
+            wp = f"Search tool error: {wp}"
+        wp = _clip(wp)
         tool_outputs["wikipedia_search"] = wp
 
-        try:
-            wsum = wiki_tool(query, sentences=5)
-        except Exception:
+        if isinstance(wsum, BaseException):
             wsum = ""
+        wsum = _clip(wsum)
         tool_outputs["wikipedia_summary"] = wsum
 
         # Save a snapshot of tool outputs (helps debugging and gives the model
@@ -90,90 +262,88 @@ def generate_research(query: str, model: str = "gemini-2.5-flash") -> ResearchRe
     except Exception as e:
         tool_outputs["tool_error"] = str(e)
 
-    tools_block = json.dumps(tool_outputs, ensure_ascii=False, indent=2)
+    # Compact separators: indented JSON only helps humans and costs ~20% more
+    # prompt bytes.
+    tools_block = json.dumps(tool_outputs, ensure_ascii=False, separators=(",", ":"))
 
-    final_prompt = (
-        f"{SYSTEM_PROMPT}\n\nUser query: {query}\n\nTool outputs (JSON):\n{tools_block}\n\n"
-        "Using the above tool outputs where relevant, produce the full research paper as a single JSON object following the schema exactly."
-    )
+    final_prompt = _PROMPT_TEMPLATE.substitute(query=query, tools=tools_block)
 
     client = get_genai_client()
-    final_resp = client.models.generate_content(model=model, contents=final_prompt)
-    # Extract text from response (handle different shapes)
-    try:
-        final_text = final_resp.text
-    except Exception:
+    # Stream the response and accumulate chunks as they arrive instead of
+    # blocking until the full multi-second completion is buffered server-side.
+    # A failed or dropped stream is retried with backoff; the tool outputs
+    # above were already collected, so retries never redo the web searches.
+    last_err = None
+    for attempt in range(_MAX_LLM_ATTEMPTS):
+        if attempt:
+            time.sleep(min(2 ** attempt, 10))
+        chunks = []
         try:
-            final_text = final_resp.candidates[0].content.parts[0].text
-        except Exception:
-            final_text = str(final_resp)
+            for chunk in client.models.generate_content_stream(
+                model=model, contents=final_prompt, config=_GENERATION_CONFIG
+            ):
+                try:
+                    text = chunk.text
+                except Exception:
+                    text = None
+                if text:
+                    chunks.append(text)
+            final_text = "".join(chunks)
+            break
+        except Exception as e:
+            last_err = e
+    else:
+        raise RuntimeError(
+            f"Gemini request failed after {_MAX_LLM_ATTEMPTS} attempts: {last_err}"
+        )
 
     final_text = _strip_code_fences(final_text)
 
-    # Try to parse JSON
+    # Try to parse JSON (tolerant of fenced/partial output)
     try:
-        data = json.loads(final_text)
-        return ResearchResponse(**data)
+        data = _parse_json_response(final_text)
+        result = ResearchResponse(**data)
+        validated = True
     except Exception:
-        # Best-effort extraction using regex when JSON is malformed
-        import re
-
-        def extract_string(key: str) -> str:
-            pattern = r'"' + re.escape(key) + r'"\s*:\s*"([\s\S]*?)"\s*(,|})'
-            m = re.search(pattern, final_text)
-            return m.group(1).strip() if m else ""
-
-        def extract_list(key: str) -> List[str]:
-            pattern = r'"' + re.escape(key) + r'"\s*:\s*\[([\s\S]*?)\]'
-            m = re.search(pattern, final_text)
-            if not m:
-                return []
-            inner = m.group(1)
-            items = re.findall(r'"([\s\S]*?)"', inner)
-            return [it.strip() for it in items]
-
-        parsed = {
-            "topic": extract_string("topic"),
-            "abstract": extract_string("abstract"),
-            "introduction": extract_string("introduction"),
-            "literature_review": extract_string("literature_review"),
-            "methodology": extract_string("methodology"),
-            "analysis_and_findings": extract_string("analysis_and_findings"),
-            "discussion": extract_string("discussion"),
-            "future_research": extract_string("future_research"),
-            "conclusion": extract_string("conclusion"),
-            "sources": extract_list("sources"),
-            "tools_used": extract_list("tools_used"),
-        }
-        return ResearchResponse(**parsed)
+        # Output was not recoverable as JSON; scrape whatever fields are
+        # present rather than crashing the CLI. The scraper always yields
+        # the full field set with the right types, so validation is skipped.
+        result = ResearchResponse.model_construct(**_extract_fields(final_text))
+        validated = False
+
+    # Persist only fully validated papers: caching a scraped (possibly
+    # empty) best-effort result would serve it forever for this query and
+    # any close paraphrase.
+    if cache is not None and validated:
+        try:
+            cache.put(query, model, result.model_dump_json())
+        except Exception:
+            pass
+    return result
 
 
 def build_paper_text(result: ResearchResponse) -> str:
-    lines = []
-    lines.append(result.topic.upper())
-    lines.append('\nABSTRACT\n')
-    lines.append(result.abstract)
-    lines.append('\nINTRODUCTION\n')
-    lines.append(result.introduction)
-    lines.append('\nLITERATURE REVIEW\n')
-    lines.append(result.literature_review)
-    lines.append('\nMETHODOLOGY\n')
-    lines.append(result.methodology)
-    lines.append('\nANALYSIS AND FINDINGS\n')
-    lines.append(result.analysis_and_findings)
-    lines.append('\nDISCUSSION\n')
-    lines.append(result.discussion)
-    lines.append('\nFUTURE RESEARCH\n')
-    lines.append(result.future_research)
-    lines.append('\nCONCLUSION\n')
-    lines.append(result.conclusion)
-    lines.append('\nREFERENCES\n')
+    # Write straight into one growable buffer instead of collecting ~20
+    # multi-KB section strings in a list and joining them at the end.
+    buf = io.StringIO()
+    buf.write(
+        f"{result.topic.upper()}\n\n"
+        f"\nABSTRACT\n\n\n{result.abstract}\n\n"
+        f"\nINTRODUCTION\n\n\n{result.introduction}\n\n"
+        f"\nLITERATURE REVIEW\n\n\n{result.literature_review}\n\n"
+        f"\nMETHODOLOGY\n\n\n{result.methodology}\n\n"
+        f"\nANALYSIS AND FINDINGS\n\n\n{result.analysis_and_findings}\n\n"
+        f"\nDISCUSSION\n\n\n{result.discussion}\n\n"
+        f"\nFUTURE RESEARCH\n\n\n{result.future_research}\n\n"
+        f"\nCONCLUSION\n\n\n{result.conclusion}\n\n"
+        f"\nREFERENCES\n"
+    )
     for i, s in enumerate(result.sources, 1):
-        lines.append(f'[{i}] {s}')
-    lines.append('\nRESEARCH METHODOLOGY & TOOLS\n')
+        buf.write(f"\n\n[{i}] {s}")
+    buf.write("\n\n\nRESEARCH METHODOLOGY & TOOLS\n")
     for t in result.tools_used:
-        lines.append(f'• {t}')
-    return "\n\n".join(lines)
+        buf.write(f"\n\n• {t}")
+    return buf.getvalue()
 
 
 def main():
@@ -205,8 +375,6 @@ def main():
             if not os.path.splitext(out_filename)[1]:
                 out_filename = out_filename + ".pdf"
         else:
-            from datetime import datetime
-
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             out_filename = f"research_output_{ts}.pdf"
 
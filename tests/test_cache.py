@@ -0,0 +1,36 @@
+import pytest
+
+from cache import ResearchCache
+
+
+@pytest.fixture
+def research_cache(tmp_path, monkeypatch):
+    """A cache on a temp database with the optional embedding model disabled,
+    so tests exercise the exact tier only and never download a model."""
+    monkeypatch.setattr("cache._embedder_unavailable", True)
+    return ResearchCache(str(tmp_path / "cache.db"))
+
+
+def test_put_get_round_trip(research_cache):
+    research_cache.put("quantum computing", "gemini-2.5-flash", '{"topic": "QC"}')
+    assert research_cache.get("quantum computing", "gemini-2.5-flash") == '{"topic": "QC"}'
+
+
+def test_miss_returns_none(research_cache):
+    assert research_cache.get("never asked", "gemini-2.5-flash") is None
+
+
+def test_key_normalizes_case_and_whitespace(research_cache):
+    research_cache.put("  Quantum Computing ", "gemini-2.5-flash", '{"topic": "QC"}')
+    assert research_cache.get("quantum computing", "gemini-2.5-flash") == '{"topic": "QC"}'
+
+
+def test_models_are_isolated(research_cache):
+    research_cache.put("quantum computing", "gemini-2.5-flash", '{"topic": "flash"}')
+    assert research_cache.get("quantum computing", "gemini-2.5-pro") is None
+
+
+def test_put_overwrites_existing_entry(research_cache):
+    research_cache.put("quantum computing", "gemini-2.5-flash", '{"topic": "old"}')
+    research_cache.put("quantum computing", "gemini-2.5-flash", '{"topic": "new"}')
+    assert research_cache.get("quantum computing", "gemini-2.5-flash") == '{"topic": "new"}'
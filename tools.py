@@ -1,11 +1,65 @@
-﻿import wikipedia
+﻿import asyncio
+import wikipedia
 import requests
-import json
-import textwrap
+import httpx
+import orjson
 import os
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional
 
+# DuckDuckGo Instant Answer API endpoint and query parameters shared by the
+# sync and async search variants.
+_DDG_URL = "https://api.duckduckgo.com/"
+
+# Shared session so repeated searches reuse the TCP/TLS connection instead
+# of handshaking on every call.
+_session = requests.Session()
+
+
+# Memoized wikipedia lookups. The same query is often searched and then
+# summarized several times per run (fallbacks + the gathered tools), so
+# repeat hits skip the network entirely. Failed lookups raise and are
+# therefore not cached.
+@lru_cache(maxsize=128)
+def _wiki_search(query: str, results: int) -> tuple:
+    return tuple(wikipedia.search(query, results=results))
+
+
+@lru_cache(maxsize=256)
+def _wiki_summary(title: str, sentences: int) -> str:
+    return wikipedia.summary(title, sentences=sentences)
+
+
+def _ddg_params(query: str) -> dict:
+    return {
+        "q": query,
+        "format": "json",
+        "no_redirect": 1,
+        "no_html": 1,
+        "skip_disambig": 1,
+    }
+
+
+def _format_ddg_results(data: dict, max_results: int) -> list:
+    """Walk a DuckDuckGo Instant Answer payload and collect readable snippets."""
+    results = []
+    # Instant answer abstract
+    abstract = data.get("Abstract") or data.get("Heading")
+    if abstract:
+        results.append(f"InstantAnswer: {abstract}")
+
+    # Related topics may contain useful snippets; filter in one comprehension
+    # and slice to the remaining budget instead of counting and breaking.
+    related = data.get("RelatedTopics", [])
+    snippets = [
+        f"{text} — {item['FirstURL']}" if item.get("FirstURL") else text
+        for item in related
+        if isinstance(item, dict) and (text := item.get("Text") or item.get("Result"))
+    ]
+    results.extend(snippets[: max_results - len(results)])
+    return results
+
 
 def web_search_tool(query: str, max_results: int = 5) -> str:
     """Perform a lightweight web search using DuckDuckGo Instant Answer API (no API key required).
@@ -14,53 +68,36 @@ def web_search_tool(query: str, max_results: int = 5) -> str:
     Falls back to Wikipedia search if DuckDuckGo returns little data.
     """
     try:
-        params = {
-            "q": query,
-            "format": "json",
-            "no_redirect": 1,
-            "no_html": 1,
-            "skip_disambig": 1,
-        }
-        r = requests.get("https://api.duckduckgo.com/", params=params, timeout=10)
+        r = _session.get(_DDG_URL, params=_ddg_params(query), timeout=10)
         r.raise_for_status()
-        data = r.json()
-
-        results = []
-        # Instant answer abstract
-        abstract = data.get("Abstract") or data.get("Heading")
-        if abstract:
-            results.append(f"InstantAnswer: {abstract}")
-
-        # Related topics may contain useful snippets
-        related = data.get("RelatedTopics", [])
-        for item in related:
-            if isinstance(item, dict):
-                text = item.get("Text") or item.get("Result")
-                first_url = item.get("FirstURL")
-                if text:
-                    if first_url:
-                        results.append(f"{text} — {first_url}")
-                    else:
-                        results.append(text)
-            if len(results) >= max_results:
-                break
+        # orjson parses the raw bytes in C, well ahead of stdlib r.json().
+        data = orjson.loads(r.content)
+
+        results = _format_ddg_results(data, max_results)
+        if results:
+            return "\n\n".join(results)
+
+        # Fallback shares search_tool's memoized wikipedia lookups, so the
+        # later explicit search_tool call in the pipeline pays no network.
+        return search_tool(query, results=max_results, sentences=2)
+    except Exception as e:
+        return f"Web search tool error: {e}"
+
+
+async def web_search_async(query: str, max_results: int = 5) -> str:
+    """Async variant of web_search_tool using httpx so callers can fan out tool calls."""
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            r = await client.get(_DDG_URL, params=_ddg_params(query))
+            r.raise_for_status()
+            data = orjson.loads(r.content)
 
+        results = _format_ddg_results(data, max_results)
         if results:
             return "\n\n".join(results)
 
-        # Fallback: use wikipedia search
-        titles = wikipedia.search(query, results=max_results)
-        if titles:
-            out = []
-            for t in titles:
-                try:
-                    s = wikipedia.summary(t, sentences=2)
-                    out.append(f"{t}: {s}")
-                except Exception:
-                    out.append(t)
-            return "\n\n".join(out)
-
-        return "No web search results found."
+        # The wikipedia package is blocking, so run the fallback in a thread.
+        return await asyncio.to_thread(search_tool, query, max_results, 2)
     except Exception as e:
         return f"Web search tool error: {e}"
 
@@ -68,14 +105,14 @@ def web_search_tool(query: str, max_results: int = 5) -> str:
 def search_tool(query: str, results: int = 3, sentences: int = 3) -> str:
     """Perform a simple search using the wikipedia package and return short summaries for top results."""
     try:
-        titles = wikipedia.search(query, results=results)
+        titles = _wiki_search(query, results)
         if not titles:
             return "No search results found."
 
         summaries = []
         for t in titles:
             try:
-                s = wikipedia.summary(t, sentences=sentences)
+                s = _wiki_summary(t, sentences)
                 summaries.append(f"{t}: {s}")
             except Exception as e:
                 summaries.append(f"{t}: (summary error: {e})")
@@ -85,14 +122,61 @@ def search_tool(query: str, results: int = 3, sentences: int = 3) -> str:
         return f"Search tool error: {e}"
 
 
+async def search_async(query: str, results: int = 3, sentences: int = 3) -> str:
+    """Async variant of search_tool; the wikipedia package is blocking, so run it in a thread."""
+    return await asyncio.to_thread(search_tool, query, results, sentences)
+
+
 def wiki_tool(title: str, sentences: int = 5) -> str:
     """Fetch a Wikipedia summary for a given title."""
     try:
-        return wikipedia.summary(title, sentences=sentences)
+        return _wiki_summary(title, sentences)
     except Exception as e:
         return f"Wiki tool error for '{title}': {e}"
 
 
+async def wiki_async(title: str, sentences: int = 5) -> str:
+    """Async variant of wiki_tool; the wikipedia package is blocking, so run it in a thread."""
+    return await asyncio.to_thread(wiki_tool, title, sentences)
+
+
+# Candidate locations for a Unicode TTF font. fpdf2 needs one to render
+# non-latin-1 text; without it we fall back to the built-in Helvetica.
+_UNICODE_FONT_PATHS = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/DejaVuSans.ttf",
+    "C:\\Windows\\Fonts\\DejaVuSans.ttf",
+)
+
+
+def _write_pdf(text: str, out_name: str) -> None:
+    """Write wrapped paragraphs of text to a PDF, using a Unicode font when available."""
+    from fpdf import FPDF
+
+    pdf = FPDF(unit="mm", format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    font_path = next((p for p in _UNICODE_FONT_PATHS if os.path.exists(p)), None)
+    if font_path:
+        pdf.add_font("DejaVu", "", font_path)
+        pdf.set_font("DejaVu", size=12)
+    else:
+        pdf.set_font("Helvetica", size=12)
+
+    # One multi_cell per paragraph; fpdf2 wraps at the cell border itself,
+    # which is one layout call instead of a cell per wrapped line.
+    for paragraph in text.split("\n\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pdf.multi_cell(0, 6, text=paragraph, new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(4)
+
+    pdf.output(out_name)
+
+
 def save_tool(content: str, filename: Optional[str] = None, as_pdf: bool = True) -> str:
     """Save content to a PDF file (preferred) or fallback to text file.
 
@@ -104,95 +188,18 @@ def save_tool(content: str, filename: Optional[str] = None, as_pdf: bool = True)
             ext = "pdf" if as_pdf else "txt"
             filename = f"research_snapshot_{ts}.{ext}"
 
-        # Attempt to write PDF using fpdf
         if as_pdf:
             try:
-                from fpdf import FPDF
-
-                def try_write_pdf(text, out_name):
-                    pdf = FPDF(unit="mm", format="A4")
-                    pdf.set_auto_page_break(auto=True, margin=15)
-                    pdf.add_page()
-                    pdf.set_font("Arial", size=12)
-
-                    # Break content into paragraphs and wrap lines
-                    for paragraph in text.split("\n\n"):
-                        paragraph = paragraph.strip()
-                        if not paragraph:
-                            continue
-                        lines = textwrap.wrap(paragraph, width=95)
-                        for line in lines:
-                            pdf.cell(0, 6, txt=line, ln=1)
-                        pdf.ln(4)
-
-                    pdf.output(out_name)
-
-                # First attempt: write as-is
-                try_write_pdf(content, filename)
+                _write_pdf(content, filename)
                 return f"Saved to {filename}"
             except Exception as e:
-                # If PDF writing fails (common cause: latin-1 encoding error),
-                # attempt simple Unicode normalization and punctuation replacement
-                err_str = str(e)
-                try:
-                    import unicodedata
-
-                    def normalize_common(text: str) -> str:
-                        # replace common smart punctuation with ASCII equivalents
-                        replacements = {
-                            '\u2013': '-',  # en dash
-                            '\u2014': ' - ',  # em dash
-                            '\u2018': "'",  # left single quote
-                            '\u2019': "'",  # right single quote
-                            '\u201c': '"',  # left double quote
-                            '\u201d': '"',  # right double quote
-                            '\u2026': '...',  # ellipsis
-                            '\u2010': '-',
-                        }
-                        for k, v in replacements.items():
-                            text = text.replace(k, v)
-                        # decompose other unicode characters and strip combining marks
-                        text = unicodedata.normalize('NFKD', text)
-                        # keep characters that are encodable in latin-1 after normalization
-                        try:
-                            text.encode('latin-1')
-                            return text
-                        except Exception:
-                            # fallback: remove characters that can't be encoded
-                            return text.encode('latin-1', 'ignore').decode('latin-1')
-
-                    safe_content = normalize_common(content)
-                    try:
-                        # retry PDF write with normalized content
-                        from fpdf import FPDF
-
-                        pdf = FPDF(unit="mm", format="A4")
-                        pdf.set_auto_page_break(auto=True, margin=15)
-                        pdf.add_page()
-                        pdf.set_font("Arial", size=12)
-                        for paragraph in safe_content.split("\n\n"):
-                            paragraph = paragraph.strip()
-                            if not paragraph:
-                                continue
-                            lines = textwrap.wrap(paragraph, width=95)
-                            for line in lines:
-                                pdf.cell(0, 6, txt=line, ln=1)
-                            pdf.ln(4)
-                        pdf.output(filename)
-                        return f"Saved to {filename} (normalized unicode characters)"
-                    except Exception as e2:
-                        # give up and write a text fallback including both errors
-                        fallback_name = filename.rsplit('.', 1)[0] + '.txt'
-                        with open(fallback_name, 'w', encoding='utf-8') as f:
-                            f.write(f"PDF save failed: {err_str}\nRetry with normalization failed: {e2}\n\nOriginal content below:\n\n")
-                            f.write(content)
-                        return f"PDF save failed ({err_str}). Normalization retry failed ({e2}). Saved text fallback to {fallback_name}"
-                except Exception:
-                    fallback_name = filename.rsplit('.', 1)[0] + '.txt'
-                    with open(fallback_name, 'w', encoding='utf-8') as f:
-                        f.write(f"PDF save failed: {e}\n\nOriginal content below:\n\n")
-                        f.write(content)
-                    return f"PDF save failed ({e}). Saved text fallback to {fallback_name}"
+                # PDF writing should no longer fail on Unicode content, but
+                # keep a text fallback for I/O or font errors.
+                fallback_name = filename.rsplit('.', 1)[0] + '.txt'
+                with open(fallback_name, 'w', encoding='utf-8') as f:
+                    f.write(f"PDF save failed: {e}\n\nOriginal content below:\n\n")
+                    f.write(content)
+                return f"PDF save failed ({e}). Saved text fallback to {fallback_name}"
 
         # Non-PDF fallback: write text
         with open(filename, "w", encoding="utf-8") as f: